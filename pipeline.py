@@ -64,7 +64,21 @@ def parse_args():
     p.add_argument("--engine", choices=["sadtalker", "liveportrait"], default="sadtalker")
     p.add_argument("--sadtalker-dir",    default="engines/SadTalker")
     p.add_argument("--liveportrait-dir", default="engines/LivePortrait")
+    p.add_argument("--faster-liveportrait-dir", default="engines/FasterLivePortrait")
+    p.add_argument("--fp16", action="store_true",
+                   help="Faster animation: fp16 autocast for SadTalker (CUDA/MPS), torch.compile for LivePortrait (CUDA only)")
+    p.add_argument("--cuda-graph", action="store_true",
+                   help="Replay the per-frame face renderer from a captured CUDA graph (CUDA only)")
+    p.add_argument("--trt", action="store_true",
+                   help="LivePortrait via TensorRT engines (CUDA only, needs: bash setup.sh --with-trt)")
     p.add_argument("--device", default=None, help="mps / cuda / cpu (auto-detected)")
+    p.add_argument("--worker", action="store_true",
+                   help="Start a background worker that keeps the engines' imports warm for later runs (Linux only)")
+    p.add_argument("--enhancer", choices=["none", "gfpgan", "RestoreFormer"], default="none",
+                   help="SadTalker face enhancer. Sharper faces but roughly 2-3x slower; "
+                        "rarely visible at 1080px wide (default: none)")
+    p.add_argument("--batch-size", type=int, default=None,
+                   help="SadTalker face-render batch size (default: sized to free VRAM, 4 on MPS)")
 
     # Background removal
     p.add_argument("--bg-color",    default=None, help="Chromakey hex color to remove (e.g. 00ff00)")
@@ -72,6 +86,11 @@ def parse_args():
 
     # Output
     p.add_argument("--output", help="Output path (default: output/tiktok_TIMESTAMP.mp4)")
+    p.add_argument("--encode-preset", default="faster",
+                   choices=["ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow"],
+                   help="x264 preset for the final encode (default: faster)")
+    p.add_argument("--hw-encode", action="store_true",
+                   help="Hardware decode/encode when available (NVENC on CUDA, VideoToolbox on Apple Silicon)")
 
     return p.parse_args()
 
@@ -81,7 +100,7 @@ def main():
 
     from src.utils import get_device, banner, check_requirements
     from src.recorder import record_audio, record_webcam
-    from src.animator import run_sadtalker, run_liveportrait
+    from src.animator import run_sadtalker, run_liveportrait, start_worker
     from src.composer import compose_final
 
     banner()
@@ -97,6 +116,9 @@ def main():
     print(f"Engine : {args.engine}")
     print(f"Output : {output_path}\n")
 
+    if args.worker:
+        start_worker()
+
     try:
         # ── Step 1: Audio ────────────────────────────────────────────────────
         audio_path = args.audio
@@ -127,6 +149,10 @@ def main():
                 output_dir=str(workdir / "animated"),
                 liveportrait_dir=args.liveportrait_dir,
                 device=device,
+                trt=args.trt,
+                faster_liveportrait_dir=args.faster_liveportrait_dir,
+                fp16=args.fp16,
+                cuda_graph=args.cuda_graph,
             )
         else:
             animated = run_sadtalker(
@@ -135,6 +161,11 @@ def main():
                 output_dir=str(workdir / "animated"),
                 sadtalker_dir=args.sadtalker_dir,
                 device=device,
+                trt=args.trt,
+                fp16=args.fp16,
+                cuda_graph=args.cuda_graph,
+                batch_size=args.batch_size,
+                enhancer=None if args.enhancer == "none" else args.enhancer,
             )
 
         # ── Step 3: Compose ──────────────────────────────────────────────────
@@ -145,6 +176,9 @@ def main():
             output_path=output_path,
             remove_bg=not args.no_bg_removal,
             bg_color=args.bg_color,
+            preset=args.encode_preset,
+            device=device,
+            hw_encode=args.hw_encode,
         )
 
         print(f"\n✅  Done!  →  {output_path}")
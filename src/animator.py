@@ -1,7 +1,128 @@
+import json
+import os
+import shutil
+import socket
 import subprocess
 import sys
+import time
 from pathlib import Path
 
+# Launches engine scripts with autocast / CUDA graphs applied from outside (see torch_runner.py)
+_TORCH_RUNNER = Path(__file__).with_name("torch_runner.py")
+
+
+def _launcher(device: str, fp16: bool = False, cuda_graph: bool = False) -> list[str]:
+    """Interpreter prefix for an engine script, routed through torch_runner when any speed-up applies."""
+    opts = []
+    if fp16 and device in ("cuda", "mps"):
+        opts.append("--fp16")
+    if cuda_graph and device == "cuda":
+        opts.append("--cuda-graph")
+    if not opts:
+        return [sys.executable]
+    return [sys.executable, str(_TORCH_RUNNER), "--device", device, *opts]
+
+
+# SadTalker face renderer: rough VRAM per frame in a batch at 256px, fp32
+_FACERENDER_MIB_PER_SAMPLE = 600
+_FACERENDER_MAX_BATCH = 32
+_FACERENDER_MPS_BATCH = 4
+
+
+def _facerender_batch_size(device: str) -> int | None:
+    """
+    Frames per SadTalker face-render call, sized to free VRAM on CUDA and capped on MPS.
+    None keeps SadTalker's own default.
+    """
+    if device == "mps":
+        return _FACERENDER_MPS_BATCH
+    if device != "cuda":
+        return None
+    # Ask nvidia-smi rather than torch: importing torch here would cost more than it saves
+    try:
+        result = subprocess.run(
+            ["nvidia-smi", "--query-gpu=memory.free", "--format=csv,noheader,nounits"],
+            capture_output=True, text=True, timeout=5,
+        )
+        free_mib = int(result.stdout.split()[0])
+    except (OSError, subprocess.SubprocessError, ValueError, IndexError):
+        return None
+    return max(1, min(_FACERENDER_MAX_BATCH, free_mib // _FACERENDER_MIB_PER_SAMPLE))
+
+
+# Optional warm worker (see worker.py) that runs engine jobs without a cold start
+_WORKER = Path(__file__).with_name("worker.py")
+_WORKER_DIR = Path.home() / ".tiktok_avatar"
+_WORKER_SOCK = _WORKER_DIR / "worker.sock"
+_WORKER_LOG = _WORKER_DIR / "worker.log"
+
+
+def _connect_worker() -> socket.socket | None:
+    if not _WORKER_SOCK.exists():
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(_WORKER_SOCK))
+    except OSError:   # stale socket from a worker that died
+        sock.close()
+        return None
+    return sock
+
+
+def start_worker():
+    """Start the warm worker in the background unless one is already listening. Linux only."""
+    if sys.platform == "darwin":
+        # The worker forks after importing torch/cv2; macOS frameworks don't survive that
+        print("   (--worker: not supported on macOS, where forking after these imports crashes — ignoring)")
+        return
+    sock = _connect_worker()
+    if sock is not None:
+        sock.close()
+        return
+    _WORKER_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+    os.chmod(_WORKER_DIR, 0o700)   # the worker runs whatever arrives on its socket
+    with open(_WORKER_LOG, "ab") as log:
+        subprocess.Popen(
+            [sys.executable, str(_WORKER), "--socket", str(_WORKER_SOCK)],
+            stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+    print(f"   (warm worker starting — later runs will use it; log: {_WORKER_LOG};"
+          f" stop: python {_WORKER} --stop)")
+
+
+def _run_engine(cmd: list[str], cwd: str):
+    """Run an engine command on the warm worker if one is up, else as a fresh subprocess."""
+    env = _engine_env()
+    sock = _connect_worker()
+    if sock is None:
+        subprocess.run(cmd, cwd=cwd, env=env, check=True)
+        return
+
+    print(f"   (running on warm worker — output in {_WORKER_LOG})")
+    with sock:
+        job = {"python": cmd[0], "argv": cmd[1:], "cwd": cwd, "env": env}
+        sock.sendall((json.dumps(job) + "\n").encode())
+        reply = sock.makefile("r").readline()
+    if not reply:
+        raise RuntimeError(f"Warm worker died during the job — see {_WORKER_LOG}")
+    reply = json.loads(reply)
+    if "refused" in reply:
+        # Started from another interpreter/venv: its warm imports aren't ours
+        print(f"   (warm worker skipped: {reply['refused']})")
+        subprocess.run(cmd, cwd=cwd, env=env, check=True)
+        return
+    returncode = reply["returncode"]
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd)
+
+
+def _engine_env() -> dict:
+    """Environment for engine subprocesses: keep torch.compile artifacts between runs."""
+    env = os.environ.copy()
+    env.setdefault("TORCHINDUCTOR_CACHE_DIR", str(Path.home() / ".cache" / "tiktok_avatar" / "torchinductor"))
+    return env
+
 
 def run_sadtalker(
     avatar_path: str,
@@ -9,31 +130,44 @@ def run_sadtalker(
     output_dir: str,
     sadtalker_dir: str = "engines/SadTalker",
     device: str = "mps",
+    trt: bool = False,
+    fp16: bool = False,
+    cuda_graph: bool = False,
+    batch_size: int | None = None,
+    enhancer: str | None = None,
 ) -> str:
     """
     Animate a still avatar image with audio using SadTalker.
+    Frames go through the face renderer batch_size at a time (auto-sized from VRAM if None).
     Returns path to the output video.
     """
     from src.utils import check_engine
 
+    if trt:
+        print("   (--trt: SadTalker has no TensorRT renderer upstream — using PyTorch)")
+
     sadtalker = Path(sadtalker_dir).resolve()
     check_engine(str(sadtalker), "SadTalker")
     Path(output_dir).mkdir(parents=True, exist_ok=True)
 
     cmd = [
-        sys.executable,
+        *_launcher(device, fp16, cuda_graph),
         str(sadtalker / "inference.py"),
         "--driven_audio", str(Path(audio_path).resolve()),
         "--source_image", str(Path(avatar_path).resolve()),
         "--result_dir",   str(Path(output_dir).resolve()),
         "--still",             # minimal head movement — good for avatars
         "--preprocess", "full",
-        "--enhancer", "gfpgan",  # face enhancement
         "--device", device,
     ]
+    if enhancer:
+        cmd += ["--enhancer", enhancer]   # face enhancement — often half of SadTalker's runtime
+    batch_size = batch_size or _facerender_batch_size(device)
+    if batch_size:
+        cmd += ["--batch_size", str(batch_size)]
 
-    print(f"\n🎭  Animating avatar with SadTalker (device={device})...")
-    subprocess.run(cmd, cwd=str(sadtalker), check=True)
+    print(f"\n🎭  Animating avatar with SadTalker (device={device}, batch={batch_size or 'default'})...")
+    _run_engine(cmd, cwd=str(sadtalker))
 
     videos = sorted(Path(output_dir).rglob("*.mp4"))
     if not videos:
@@ -47,29 +181,81 @@ def run_liveportrait(
     output_dir: str,
     liveportrait_dir: str = "engines/LivePortrait",
     device: str = "mps",
+    trt: bool = False,
+    faster_liveportrait_dir: str = "engines/FasterLivePortrait",
+    fp16: bool = False,
+    cuda_graph: bool = False,
 ) -> str:
     """
     Animate avatar using LivePortrait driven by a reference video.
+    With trt on a CUDA device, runs the TensorRT engines from FasterLivePortrait instead.
     Returns path to the output video.
     """
     from src.utils import check_engine
 
+    if trt:
+        if device == "cuda":
+            return _run_faster_liveportrait(avatar_path, driving_path, output_dir, faster_liveportrait_dir)
+        print(f"   (--trt needs a CUDA device, got {device} — using PyTorch LivePortrait)")
+
     liveportrait = Path(liveportrait_dir).resolve()
     check_engine(str(liveportrait), "LivePortrait")
     Path(output_dir).mkdir(parents=True, exist_ok=True)
 
     cmd = [
-        sys.executable,
+        *_launcher(device, cuda_graph=cuda_graph),  # LivePortrait handles its own half precision
         str(liveportrait / "inference.py"),
         "-s", str(Path(avatar_path).resolve()),
         "-d", str(Path(driving_path).resolve()),
         "--output-dir", str(Path(output_dir).resolve()),
     ]
+    if fp16 and device == "cuda":
+        # LivePortrait already runs in half precision; let it torch.compile its modules too
+        cmd.append("--flag-do-torch-compile")
+    elif fp16:
+        print(f"   (--fp16: LivePortrait torch.compile needs CUDA, got {device} — ignored)")
 
     print(f"\n🎭  Animating avatar with LivePortrait (device={device})...")
-    subprocess.run(cmd, cwd=str(liveportrait), check=True)
+    _run_engine(cmd, cwd=str(liveportrait))
 
     videos = sorted(Path(output_dir).rglob("*.mp4"))
     if not videos:
         raise RuntimeError("LivePortrait produced no output video")
     return str(videos[-1])
+
+
+def _run_faster_liveportrait(
+    avatar_path: str,
+    driving_path: str,
+    output_dir: str,
+    faster_dir: str,
+) -> str:
+    """
+    LivePortrait through FasterLivePortrait's prebuilt TensorRT engines (CUDA only).
+    Its run.py always writes under <repo>/results, so the new video is moved into output_dir.
+    """
+    from src.utils import check_engine
+
+    faster = Path(faster_dir).resolve()
+    check_engine(str(faster), "FasterLivePortrait")
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+
+    cmd = [
+        sys.executable,
+        str(faster / "run.py"),
+        "--src_image", str(Path(avatar_path).resolve()),
+        "--dri_video", str(Path(driving_path).resolve()),
+        "--cfg", "configs/trt_infer.yaml",
+    ]
+
+    print("\n🎭  Animating avatar with LivePortrait (TensorRT)...")
+    started = time.time()
+    _run_engine(cmd, cwd=str(faster))
+
+    videos = [v for v in (faster / "results").rglob("*.mp4") if v.stat().st_mtime >= started]
+    if not videos:
+        raise RuntimeError("FasterLivePortrait produced no output video")
+    # Prefer the pasted-back full frame over the face crop when both are written
+    full = [v for v in videos if "crop" not in v.stem] or videos
+    latest = max(full, key=lambda v: v.stat().st_mtime)
+    return shutil.move(str(latest), str(Path(output_dir).resolve() / latest.name))
@@ -1,15 +1,68 @@
 """
 Background removal + compositing + final export.
 
-Two modes:
+Three modes:
   - chromakey: fast, use when avatar image has a solid-color background
+  - alpha:     fastest, used automatically when the avatar video already has transparency
   - rembg:     automatic AI-based removal, works on any background
 """
 
+import os
+import queue
 import subprocess
+import threading
 from pathlib import Path
 
 
+# Segmentation model used by the rembg path. Inference goes straight through
+# onnxruntime so frames can be pushed through U²-Net in batches.
+_SEG_MODEL = "u2net_human_seg"
+_SEG_SIZE = 320
+_SEG_BATCH = 8
+_SEG_MEAN = (0.485, 0.456, 0.406)
+_SEG_STD = (0.229, 0.224, 0.225)
+_QUEUE_SIZE = 32
+_POLL_INTERVAL = 0.1   # how often blocked stages check for a stop
+_SEG_PROVIDERS = ["CUDAExecutionProvider", "CoreMLExecutionProvider", "CPUExecutionProvider"]
+_GRADIENT_TOP = 20      # default background: gray ramp from 20 at the top ...
+_GRADIENT_SPAN = 40.0   # ... to 60 at the bottom
+_SEG_INT8_MIN_IOU = 0.9   # int8 model is kept only if its masks match fp32 this well
+
+
+# ── Encoder settings (shared by every export path) ─────────────────────────────
+
+def _video_codec_args(preset: str = "faster", device: str = "cpu", hw_encode: bool = False) -> list[str]:
+    """
+    ffmpeg video encoder arguments for the final export.
+    x264 runs frame-threaded (faster than sliced threads at 1080×1920);
+    with hw_encode, NVENC (CUDA) or VideoToolbox (Apple Silicon) is used instead.
+    """
+    if hw_encode and device == "cuda":
+        return ["-c:v", "h264_nvenc", "-preset", "p4", "-cq", "19"]
+    if hw_encode and device == "mps":
+        return ["-c:v", "h264_videotoolbox", "-b:v", "8M"]
+    return [
+        "-c:v", "libx264", "-crf", "18", "-preset", preset,
+        "-threads", "0",
+        "-x264-params", "threads=auto:sliced-threads=0:lookahead-threads=2",
+    ]
+
+
+def _hwaccel_args(device: str = "cpu", hw_encode: bool = False) -> list[str]:
+    """Hardware decode for the avatar input; frames come back to system memory for the CPU filters."""
+    if hw_encode and device == "cuda":
+        return ["-hwaccel", "cuda"]
+    if hw_encode and device == "mps":
+        return ["-hwaccel", "videotoolbox"]
+    return []
+
+
+def _filter_thread_args() -> list[str]:
+    """libavfilter runs a filter graph on one core unless told otherwise."""
+    threads = str(min(os.cpu_count() or 1, 8))
+    return ["-filter_threads", threads, "-filter_complex_threads", threads]
+
+
 # ── Chromakey path (fast, uses ffmpeg) ────────────────────────────────────────
 
 def compose_chromakey(
@@ -21,6 +74,8 @@ def compose_chromakey(
     similarity: float = 0.3,
     width: int = 1080,
     height: int = 1920,
+    video_codec: list[str] | None = None,
+    hwaccel: list[str] | None = None,
 ):
     """Fast background removal using ffmpeg chromakey filter."""
     Path(output_path).parent.mkdir(parents=True, exist_ok=True)
@@ -42,13 +97,14 @@ def compose_chromakey(
 
     cmd = [
         "ffmpeg", "-y",
+        *_filter_thread_args(),
         *bg_input,
-        "-i", avatar_video,
+        *(hwaccel or []), "-i", avatar_video,
         "-i", audio_path,
         "-filter_complex", filter_complex,
         "-map", "[out]",
         "-map", "2:a:0",
-        "-c:v", "libx264", "-crf", "18", "-preset", "medium",
+        *(video_codec or _video_codec_args()),
         "-c:a", "aac", "-b:a", "192k",
         "-shortest",
         output_path,
@@ -58,8 +114,281 @@ def compose_chromakey(
     subprocess.run(cmd, check=True)
 
 
+# ── Alpha path (avatar already carries transparency, pure ffmpeg) ───────────
+
+_ALPHA_PIX_FMTS = ("yuva", "rgba", "bgra", "argb", "abgr", "gbrap", "ya8", "ya16")
+# Native vp8/vp9 decoders drop the webm alpha side channel; these libvpx ones keep it
+_VPX_ALPHA_DECODERS = {"vp8": "libvpx", "vp9": "libvpx-vp9"}
+
+
+def _probe_alpha(video: str) -> tuple[bool, str | None]:
+    """
+    Return (has_alpha, vpx_decoder) for the first video stream.
+    VP8/VP9 webm keeps alpha in a side channel that only libvpx decodes, flagged by the alpha_mode tag;
+    vpx_decoder is the libvpx decoder to force for it (None when not needed).
+    """
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=codec_name,pix_fmt:stream_tags=alpha_mode",
+        "-of", "default=noprint_wrappers=1",
+        video,
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    except OSError:   # no ffprobe on PATH — treat as opaque and let rembg handle it
+        return False, None
+    if result.returncode != 0:
+        return False, None
+    fields = dict(line.split("=", 1) for line in result.stdout.splitlines() if "=" in line)
+    vpx_decoder = None
+    if fields.get("TAG:alpha_mode") == "1":
+        vpx_decoder = _VPX_ALPHA_DECODERS.get(fields.get("codec_name"))
+    return vpx_decoder is not None or fields.get("pix_fmt", "").startswith(_ALPHA_PIX_FMTS), vpx_decoder
+
+
+def compose_ffmpeg_alpha(
+    avatar_video: str,
+    audio_path: str,
+    background_path: str,
+    output_path: str,
+    width: int = 1080,
+    height: int = 1920,
+    vpx_decoder: str | None = None,
+    video_codec: list[str] | None = None,
+):
+    """Composite an avatar video that already has an alpha channel, in a single ffmpeg pass."""
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+
+    if not background_path:
+        # Same dark gradient as the rembg path: render one frame, then loop it
+        v = f"trunc({_GRADIENT_TOP}+Y*{_GRADIENT_SPAN}/H)"
+        bg_input = ["-f", "lavfi", "-i", (
+            f"color=c=black:s={width}x{height}:r=25:d=0.04,format=rgb24,"
+            f"geq=r='{v}':g='{v}':b='{v}',loop=loop=-1:size=1"
+        )]
+    elif Path(background_path).suffix.lower() in {".mp4", ".mov", ".avi", ".webm"}:
+        bg_input = ["-i", background_path]
+    else:
+        bg_input = ["-loop", "1", "-i", background_path]
+
+    fg_input = ["-c:v", vpx_decoder, "-i", avatar_video] if vpx_decoder else ["-i", avatar_video]
+
+    filter_complex = (
+        f"[0:v]scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height}[bg];"
+        f"[1:v]scale=-1:{height}[fg];"
+        f"[bg][fg]overlay=(W-w)/2:(H-h)/2[out]"
+    )
+
+    cmd = [
+        "ffmpeg", "-y",
+        *_filter_thread_args(),
+        *bg_input,
+        *fg_input,
+        "-i", audio_path,
+        "-filter_complex", filter_complex,
+        "-map", "[out]",
+        "-map", "2:a:0",
+        *(video_codec or _video_codec_args()),
+        "-c:a", "aac", "-b:a", "192k",
+        "-shortest",
+        output_path,
+    ]
+
+    print("\n🎬  Compositing (native alpha)...")
+    subprocess.run(cmd, check=True)
+    print(f"✓ Saved: {output_path}")
+
+
 # ── rembg path (automatic AI removal) ─────────────────────────────────────────
 
+def _seg_int8_path() -> Path:
+    """Where setup.sh puts the int8 model, next to rembg's cached fp32 one (no download)."""
+    from rembg.sessions.u2net_human_seg import U2netHumanSegSession
+
+    return Path(U2netHumanSegSession.u2net_home()) / f"{_SEG_MODEL}_int8.onnx"
+
+
+def _seg_model_paths() -> tuple[Path, Path]:
+    """(fp32, int8) model paths; the fp32 one is downloaded by rembg on first use."""
+    from rembg.sessions.u2net_human_seg import U2netHumanSegSession
+
+    model_path = Path(U2netHumanSegSession.download_models())  # cached in ~/.u2net after first run
+    return model_path, _seg_int8_path()
+
+
+def _load_seg_session():
+    """
+    Load u2net_human_seg as an onnxruntime session on the best available provider.
+    CPU-only hosts get the int8 model when setup.sh has built one.
+    """
+    import onnxruntime as ort
+
+    model_path, int8_path = _seg_model_paths()
+    available = set(ort.get_available_providers())
+    providers = [p for p in _SEG_PROVIDERS if p in available]
+    if providers == ["CPUExecutionProvider"] and int8_path.exists():
+        model_path = int8_path
+    return ort.InferenceSession(str(model_path), providers=providers)
+
+
+def build_int8_seg_model(sample_images: list[str]) -> bool:
+    """
+    Quantize u2net_human_seg to int8 (dynamic, weights only) for CPU-only runs.
+    The int8 masks are compared with fp32 on the sample images, and the model is
+    only kept if the mean IoU reaches _SEG_INT8_MIN_IOU — no samples, no int8 model.
+    Returns True if an int8 model is in place afterwards.
+    """
+    import cv2
+    import numpy as np
+    import onnxruntime as ort
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    # Checked before _seg_model_paths(), which downloads the ~170 MB fp32 model
+    frames = [f for f in (cv2.imread(p, cv2.IMREAD_COLOR) for p in sample_images) if f is not None]
+    if not frames:
+        _seg_int8_path().unlink(missing_ok=True)
+        print("✗ int8 model not built: no avatar images in assets/ to validate it against (CPU runs stay fp32)")
+        print("  Add assets/avatar.png, then run: bash setup.sh --int8-only")
+        return False
+
+    model_path, int8_path = _seg_model_paths()
+    # _load_seg_session picks up int8_path as soon as it exists: only move it there once validated
+    tmp_path = int8_path.with_name(f"{int8_path.name}.tmp")
+    try:
+        quantize_dynamic(str(model_path), str(tmp_path), weight_type=QuantType.QInt8)
+
+        cpu = ["CPUExecutionProvider"]
+        ref = _predict_masks(ort.InferenceSession(str(model_path), providers=cpu), frames)
+        got = _predict_masks(ort.InferenceSession(str(tmp_path), providers=cpu), frames)
+        ious = [
+            np.logical_and(a > 127, b > 127).sum() / max(np.logical_or(a > 127, b > 127).sum(), 1)
+            for a, b in zip(ref, got)
+        ]
+        iou = float(np.mean(ious))
+        if iou < _SEG_INT8_MIN_IOU:
+            int8_path.unlink(missing_ok=True)
+            print(f"✗ int8 model dropped: mask IoU {iou:.3f} < {_SEG_INT8_MIN_IOU} (CPU runs stay fp32)")
+            return False
+        os.replace(tmp_path, int8_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    print(f"✓ int8 model: {int8_path} (mask IoU vs fp32 {iou:.3f})")
+    return True
+
+
+def _seg_batch_size(session) -> int:
+    """Models exported with a fixed batch dimension can only take that many frames."""
+    dim = session.get_inputs()[0].shape[0]
+    return dim if isinstance(dim, int) and dim > 0 else _SEG_BATCH
+
+
+def _predict_masks(session, frames: list) -> list:
+    """Run U²-Net on a batch of BGR frames, return uint8 masks at each frame's size."""
+    import cv2
+    import numpy as np
+
+    batch = np.stack([
+        cv2.resize(f, (_SEG_SIZE, _SEG_SIZE), interpolation=cv2.INTER_AREA)[:, :, ::-1]
+        for f in frames
+    ]).astype(np.float32)
+    np.divide(batch, np.maximum(batch.max(axis=(1, 2, 3), keepdims=True), 1e-6), out=batch)
+    batch -= np.array(_SEG_MEAN, dtype=np.float32)
+    batch /= np.array(_SEG_STD, dtype=np.float32)
+    batch = np.ascontiguousarray(batch.transpose(0, 3, 1, 2))
+
+    input_name = session.get_inputs()[0].name
+    pred = session.run(None, {input_name: batch})[0][:, 0, :, :]
+
+    # Same per-image min/max normalisation rembg applies to the raw prediction
+    mi = pred.min(axis=(1, 2), keepdims=True)
+    ma = pred.max(axis=(1, 2), keepdims=True)
+    pred = (pred - mi) / np.maximum(ma - mi, 1e-6)
+    masks = (pred * 255).astype(np.uint8)
+
+    return [
+        cv2.resize(m, (f.shape[1], f.shape[0]), interpolation=cv2.INTER_LINEAR)
+        for f, m in zip(frames, masks)
+    ]
+
+
+def _alpha_blend(dst, fg, alpha, scratch: dict):
+    """
+    In-place dst = fg*alpha + dst*(1-alpha) for uint8 images, in integer math.
+    Alpha is stretched to 0..256 so the >>8 is exact at both ends; the uint16
+    work buffers live in `scratch` and are reused across frames of the same size.
+    """
+    import numpy as np
+
+    shape = fg.shape[:2]
+    if scratch.get("shape") != shape:
+        scratch.update(
+            shape=shape,
+            a=np.empty((*shape, 1), np.uint16),
+            fg=np.empty((*shape, 3), np.uint16),
+            bg=np.empty((*shape, 3), np.uint16),
+        )
+    a, acc, tmp = scratch["a"], scratch["fg"], scratch["bg"]
+
+    np.copyto(a[..., 0], alpha)
+    a += a >> 7
+    np.multiply(fg, a, out=acc)
+    np.subtract(256, a, out=a)
+    np.multiply(dst, a, out=tmp)
+    acc += tmp
+    acc >>= 8
+    np.copyto(dst, acc, casting="unsafe")
+
+
+class _Stopped(Exception):
+    """Raised inside a stage once another stage failed or the run was interrupted."""
+
+
+def _get(q: queue.Queue, stop: threading.Event):
+    """Blocking get that gives up as soon as the pipeline is stopped."""
+    while True:
+        if stop.is_set():
+            raise _Stopped
+        try:
+            return q.get(timeout=_POLL_INTERVAL)
+        except queue.Empty:
+            pass
+
+
+def _put(q: queue.Queue, item, stop: threading.Event):
+    """Blocking put that gives up as soon as the pipeline is stopped."""
+    while True:
+        if stop.is_set():
+            raise _Stopped
+        try:
+            q.put(item, timeout=_POLL_INTERVAL)
+            return
+        except queue.Full:
+            pass
+
+
+def _iter_queue(q: queue.Queue, stop: threading.Event):
+    """Yield items from a stage queue until the None sentinel."""
+    while (item := _get(q, stop)) is not None:
+        yield item
+
+
+def _run_stage(produce, outbox: queue.Queue, errors: list, stop: threading.Event):
+    """
+    Thread body: push everything produce() yields into outbox, then the sentinel.
+    A failure is recorded and stops every other stage instead of letting them run to the end.
+    """
+    try:
+        for item in produce():
+            _put(outbox, item, stop)
+        _put(outbox, None, stop)
+    except _Stopped:
+        pass
+    except BaseException as e:
+        errors.append(e)
+        stop.set()
+
+
 def compose_rembg(
     avatar_video: str,
     audio_path: str,
@@ -67,51 +396,72 @@ def compose_rembg(
     output_path: str,
     width: int = 1080,
     height: int = 1920,
+    video_codec: list[str] | None = None,
 ):
-    """AI background removal frame-by-frame, then composite onto background."""
+    """AI background removal in batches of frames, then composite onto background."""
+    import av
     import cv2
     import numpy as np
-    from PIL import Image
-    from rembg import remove, new_session
-    import tempfile, os
 
     Path(output_path).parent.mkdir(parents=True, exist_ok=True)
 
-    print("\n🤖  Removing background with rembg (u2net_human_seg)...")
-    session = new_session("u2net_human_seg")
+    print(f"\n🤖  Removing background with rembg ({_SEG_MODEL})...")
+    session = _load_seg_session()
+    batch_size = _seg_batch_size(session)
+    print(f"   Providers: {', '.join(session.get_providers())}  (batch={batch_size})")
 
-    cap = cv2.VideoCapture(avatar_video)
-    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
-    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    # PyAV decodes with libavcodec frame threading and hands frames straight to numpy
+    container = av.open(avatar_video)
+    stream = container.streams.video[0]
+    stream.thread_type = "AUTO"
+    fps = float(stream.average_rate or 25.0)
+    total = stream.frames
 
-    # Prepare background
+    # Prepare background — a still background is resized once into bg_scratch
     bg_is_video = Path(background_path).suffix.lower() in {".mp4", ".mov", ".avi", ".webm"}
     bg_cap = None
+    bg_scratch = np.empty((height, width, 3), np.uint8)
     if background_path:
         if bg_is_video:
             bg_cap = cv2.VideoCapture(background_path)
         else:
-            bg_img = Image.open(background_path).convert("RGB").resize((width, height), Image.LANCZOS)
+            bg_still = cv2.imread(background_path, cv2.IMREAD_COLOR)
+            if bg_still is None:
+                raise RuntimeError(f"Cannot read background image: {background_path}")
+            cv2.resize(bg_still, (width, height), dst=bg_scratch, interpolation=cv2.INTER_AREA)
     else:
-        # Default: dark gradient background
-        bg_arr = np.zeros((height, width, 3), dtype=np.uint8)
-        for y in range(height):
-            v = int(20 + (y / height) * 40)
-            bg_arr[y, :] = [v, v, v]
-        bg_img = Image.fromarray(bg_arr)
-
-    # Write frames to a temp video (no audio)
-    tmp_video = output_path.replace(".mp4", "_noaudio.mp4")
-    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-    out = cv2.VideoWriter(tmp_video, fourcc, fps, (width, height))
+        # Default: dark vertical gradient background
+        v = (_GRADIENT_TOP + np.arange(height, dtype=np.float32) * (_GRADIENT_SPAN / height)).astype(np.uint8)
+        np.copyto(bg_scratch, v[:, None, None])
+
+    # Pipe raw frames straight into ffmpeg: one x264 encode, audio muxed in the same pass
+    cmd = [
+        "ffmpeg", "-y",
+        "-f", "rawvideo", "-pix_fmt", "bgr24",
+        "-s", f"{width}x{height}", "-r", f"{fps}",
+        "-i", "-",
+        "-i", audio_path,
+        "-map", "0:v:0", "-map", "1:a:0",
+        *(video_codec or _video_codec_args()),
+        "-pix_fmt", "yuv420p",   # bgr24 input would otherwise yield 4:4:4 H.264 most players reject
+        "-c:a", "aac", "-b:a", "192k",
+        "-shortest",
+        output_path,
+    ]
+    encoder = subprocess.Popen(cmd, stdin=subprocess.PIPE)
 
-    frame_idx = 0
     print(f"   Processing {total} frames at {fps:.0f}fps...")
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
+    # Output canvases are recycled: the writer hands each one back after encoding it.
+    # Enough for a whole batch on top of a full composed_q plus the one being written,
+    # so the segmenter never waits on the encoder for a canvas.
+    free_canvases = queue.Queue()
+    for _ in range(batch_size + _QUEUE_SIZE + 1):
+        free_canvases.put(np.empty_like(bg_scratch))
+    blend_scratch = {}
+
+    def composite(frame, mask):
+        canvas = _get(free_canvases, stop)
 
         # Get background for this frame
         if bg_cap is not None:
@@ -119,52 +469,90 @@ def compose_rembg(
             if not ret_bg:
                 bg_cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
                 _, bg_frame = bg_cap.read()
-            bg_img = Image.fromarray(cv2.cvtColor(bg_frame, cv2.COLOR_BGR2RGB)).resize(
-                (width, height), Image.LANCZOS
-            )
-
-        # Remove background
-        frame_pil = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-        fg_rgba = remove(frame_pil, session=session)
-
-        # Scale avatar to fit height, keep aspect ratio
-        aw, ah = fg_rgba.size
-        scale = height / ah
-        new_w = int(aw * scale)
-        fg_rgba = fg_rgba.resize((new_w, height), Image.LANCZOS)
-
-        # Paste centered on background
-        composite = bg_img.copy().convert("RGB")
-        x = (width - new_w) // 2
-        composite.paste(fg_rgba, (x, 0), fg_rgba)
-
-        out.write(cv2.cvtColor(np.array(composite), cv2.COLOR_RGB2BGR))
+            cv2.resize(bg_frame, (width, height), dst=canvas, interpolation=cv2.INTER_AREA)
+        else:
+            np.copyto(canvas, bg_scratch)
 
-        frame_idx += 1
-        if frame_idx % 25 == 0:
-            pct = frame_idx / max(total, 1) * 100
-            print(f"   {frame_idx}/{total} frames ({pct:.0f}%)")
+        # Scale avatar + mask to fit height, keep aspect ratio
+        fh, fw = frame.shape[:2]
+        new_w = int(fw * height / fh)
+        fg = cv2.resize(frame, (new_w, height), interpolation=cv2.INTER_LANCZOS4)
+        alpha = cv2.resize(mask, (new_w, height), interpolation=cv2.INTER_LINEAR)
 
-    cap.release()
-    out.release()
-    if bg_cap:
-        bg_cap.release()
+        # Blend centered on background (crop the sides if the avatar is wider than the canvas)
+        x = (width - new_w) // 2
+        if x < 0:
+            fg, alpha, x = fg[:, -x:-x + width], alpha[:, -x:-x + width], 0
+        _alpha_blend(canvas[:, x:x + fg.shape[1]], fg, alpha, blend_scratch)
+        return canvas
+
+    # Decode → segment+composite → encode run as overlapping stages.
+    # PyAV, cv2, numpy and onnxruntime release the GIL, so plain threads are enough.
+    decoded_q = queue.Queue(maxsize=_QUEUE_SIZE)
+    composed_q = queue.Queue(maxsize=_QUEUE_SIZE)
+    errors = []
+    stop = threading.Event()
+
+    def read_frames():
+        for frame in container.decode(stream):
+            if stop.is_set():
+                return
+            yield frame.to_ndarray(format="bgr24")
+
+    def segment_and_composite():
+        batch = []
+        for frame in _iter_queue(decoded_q, stop):
+            batch.append(frame)
+            if len(batch) == batch_size:
+                yield from map(composite, batch, _predict_masks(session, batch))
+                batch = []
+        if batch and not stop.is_set():
+            yield from map(composite, batch, _predict_masks(session, batch))
+
+    stages = [
+        threading.Thread(target=_run_stage, args=(read_frames, decoded_q, errors, stop), daemon=True),
+        threading.Thread(target=_run_stage, args=(segment_and_composite, composed_q, errors, stop), daemon=True),
+    ]
+    for t in stages:
+        t.start()
 
+    frame_idx = 0
+    try:
+        for result in _iter_queue(composed_q, stop):
+            encoder.stdin.write(result.data)
+            free_canvases.put(result)
+            frame_idx += 1
+            if frame_idx % 25 == 0:
+                pct = frame_idx / max(total, 1) * 100
+                print(f"   {frame_idx}/{total} frames ({pct:.0f}%)")
+    except _Stopped:
+        pass   # a stage failed; its error is raised below
+    except BrokenPipeError:
+        # ffmpeg stopped reading: -shortest hit the end of the audio, or it failed (checked below)
+        stop.set()
+    except BaseException:
+        # Encoder died or Ctrl-C: stop decoding/segmenting now rather than after the whole clip
+        stop.set()
+        encoder.kill()
+        raise
+    finally:
+        for t in stages:
+            t.join()
+        container.close()
+        if bg_cap:
+            bg_cap.release()
+
+    if errors:
+        encoder.kill()
+        raise errors[0]
+
+    try:
+        encoder.stdin.close()
+    except BrokenPipeError:
+        pass
+    if encoder.wait() != 0:
+        raise subprocess.CalledProcessError(encoder.returncode, cmd)
     print("✓ Frames composited")
-
-    # Mux audio
-    print("🔊  Muxing audio...")
-    cmd = [
-        "ffmpeg", "-y",
-        "-i", tmp_video,
-        "-i", audio_path,
-        "-c:v", "copy",
-        "-c:a", "aac", "-b:a", "192k",
-        "-shortest",
-        output_path,
-    ]
-    subprocess.run(cmd, check=True)
-    Path(tmp_video).unlink(missing_ok=True)
     print(f"✓ Saved: {output_path}")
 
 
@@ -179,23 +567,43 @@ def compose_final(
     bg_color: str | None = None,
     width: int = 1080,
     height: int = 1920,
+    preset: str = "faster",
+    device: str = "cpu",
+    hw_encode: bool = False,
 ):
     bg = background_path or ""
+    video_codec = _video_codec_args(preset, device, hw_encode)
 
     if not remove_bg:
         # Just reformat to 9:16 and mux audio
-        _export_plain(avatar_video, audio_path, output_path, width, height)
+        _export_plain(avatar_video, audio_path, output_path, width, height, video_codec)
         return
 
     if bg_color:
         if not bg:
             raise ValueError("--bg-color requires --bg to specify a background")
-        compose_chromakey(avatar_video, audio_path, bg, output_path, bg_color, width=width, height=height)
+        compose_chromakey(
+            avatar_video, audio_path, bg, output_path, bg_color,
+            width=width, height=height, video_codec=video_codec,
+            hwaccel=_hwaccel_args(device, hw_encode),
+        )
+        return
+
+    has_alpha, vpx_decoder = _probe_alpha(avatar_video)
+    if has_alpha:
+        compose_ffmpeg_alpha(avatar_video, audio_path, bg, output_path, width, height, vpx_decoder, video_codec)
     else:
-        compose_rembg(avatar_video, audio_path, bg, output_path, width, height)
+        compose_rembg(avatar_video, audio_path, bg, output_path, width, height, video_codec)
 
 
-def _export_plain(video: str, audio: str, output: str, width: int, height: int):
+def _export_plain(
+    video: str,
+    audio: str,
+    output: str,
+    width: int,
+    height: int,
+    video_codec: list[str] | None = None,
+):
     """Reformat to 9:16 and mux audio, no compositing."""
     Path(output).parent.mkdir(parents=True, exist_ok=True)
     cmd = [
@@ -204,7 +612,7 @@ def _export_plain(video: str, audio: str, output: str, width: int, height: int):
         "-i", audio,
         "-vf", f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
                f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2",
-        "-c:v", "libx264", "-crf", "18",
+        *(video_codec or _video_codec_args()),
         "-c:a", "aac", "-b:a", "192k",
         "-map", "0:v:0", "-map", "1:a:0",
         "-shortest",
@@ -1,16 +1,21 @@
+import queue
 import sys
-import termios
 import threading
 import time
-import tty
 
 import numpy as np
 from pathlib import Path
 
+_WEBCAM_QUEUE_SIZE = 64   # frames buffered between capture and writer
+_PREVIEW_EVERY = 3        # refresh the preview window every Nth frame
+
 
 def _wait_for_space(stop_event: threading.Event):
     """Background thread: sets stop_event when user presses SPACE or ENTER."""
     try:
+        import termios
+        import tty   # POSIX only — on Windows this falls through to the duration timeout
+
         old = termios.tcgetattr(sys.stdin)
         tty.setraw(sys.stdin.fileno())
         try:
@@ -42,10 +47,17 @@ def record_audio(output_path: str, duration: int = 30, sample_rate: int = 44100)
     key_thread = threading.Thread(target=_wait_for_space, args=(stop_event,), daemon=True)
     key_thread.start()
 
-    chunks = []
+    # One preallocated buffer for the whole take: the callback only copies into it
+    buf = np.empty((duration * sample_rate, 1), dtype=np.int16)
+    pos = 0
 
     def _callback(indata, frames, time_info, status):
-        chunks.append(indata.copy())
+        nonlocal pos
+        n = min(frames, len(buf) - pos)
+        buf[pos:pos + n] = indata[:n]
+        pos += n
+        if pos == len(buf):
+            stop_event.set()
 
     try:
         with sd.InputStream(
@@ -60,10 +72,10 @@ def record_audio(output_path: str, duration: int = 30, sample_rate: int = 44100)
 
     print("\n   (stopped — saving...)")
 
-    if not chunks:
+    if pos == 0:
         raise RuntimeError("No audio was recorded")
 
-    audio = np.concatenate(chunks, axis=0)
+    audio = buf[:pos]
     wavfile.write(output_path, sample_rate, audio)
     print(f"✓ Audio saved: {output_path}  ({len(audio) / sample_rate:.1f}s)")
     return output_path
@@ -78,25 +90,49 @@ def record_webcam(output_path: str, duration: int = 30) -> str:
     cap = cv2.VideoCapture(0)
     if not cap.isOpened():
         raise RuntimeError("Cannot open webcam")
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)   # hand us fresh frames, don't queue in the driver
 
     fps = int(cap.get(cv2.CAP_PROP_FPS)) or 25
     w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
 
-    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-    out = cv2.VideoWriter(output_path, fourcc, fps, (w, h))
+    # avc1 is hardware H.264 on macOS; other OpenCV builds usually only have mp4v
+    out = None
+    fourccs = ["avc1", "mp4v"] if sys.platform == "darwin" else ["mp4v"]
+    for code in fourccs:
+        out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*code), fps, (w, h))
+        if out.isOpened():
+            break
 
     print(f"\n📹  Recording webcam for {duration}s — press Q to stop early.\n")
-    start = time.time()
-    while time.time() - start < duration:
-        ret, frame = cap.read()
-        if not ret:
-            break
+
+    # The capture thread only reads; writing and the preview window (which must
+    # stay on the main thread for macOS) happen here, so the camera never waits on the GUI.
+    frames = queue.Queue(maxsize=_WEBCAM_QUEUE_SIZE)
+    stop_event = threading.Event()
+
+    def _capture():
+        start = time.time()
+        try:
+            while not stop_event.is_set() and time.time() - start < duration:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                frames.put(frame)
+        finally:
+            frames.put(None)
+
+    capture_thread = threading.Thread(target=_capture, daemon=True)
+    capture_thread.start()
+
+    for i, frame in enumerate(iter(frames.get, None)):
         out.write(frame)
-        cv2.imshow("Recording (Q to stop)", frame)
-        if cv2.waitKey(1) & 0xFF == ord("q"):
-            break
+        if i % _PREVIEW_EVERY == 0:
+            cv2.imshow("Recording (Q to stop)", frame)
+            if cv2.waitKey(1) & 0xFF == ord("q"):
+                stop_event.set()
 
+    capture_thread.join()
     cap.release()
     out.release()
     cv2.destroyAllWindows()
@@ -0,0 +1,145 @@
+"""
+Run an engine's inference script with optional torch speed-ups applied from outside.
+
+    python torch_runner.py --device cuda [--fp16] [--cuda-graph] path/to/inference.py [script args...]
+
+  --fp16        wrap the whole run in torch.inference_mode() + fp16 autocast
+  --cuda-graph  capture the per-frame face renderer in a CUDA graph and replay it
+
+This file executes inside the engine's process with the engine's directory on
+sys.path, so it must not import anything from this repo (SadTalker ships its
+own top-level `src` package).
+"""
+
+import argparse
+import contextlib
+import functools
+import importlib
+import runpy
+import sys
+from pathlib import Path
+
+# Per-frame renderers called with fixed-shape inputs: (module, class, method)
+_GRAPH_TARGETS = [
+    ("src.facerender.modules.generator", "OcclusionAwareSPADEGenerator", "forward"),  # SadTalker
+    ("src.live_portrait_wrapper", "LivePortraitWrapper", "warp_decode"),              # LivePortrait
+]
+_GRAPH_WARMUP = 3
+_MAX_GRAPHS = 2   # SadTalker's last batch is usually short; anything beyond that runs eagerly
+
+
+class _GraphedCall:
+    """Capture fn once per input signature in a CUDA graph, then copy inputs in and replay."""
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.graphs = {}
+
+    def __call__(self, *args, **kwargs):
+        import torch
+        from torch.utils._pytree import tree_flatten, tree_map
+
+        leaves, spec = tree_flatten((args, kwargs))
+        # TreeSpec itself isn't hashable; its str() describes the same structure
+        try:
+            key = (str(spec), tuple(
+                (tuple(t.shape), t.dtype, t.device) if torch.is_tensor(t) else t for t in leaves
+            ))
+            hash(key)
+        except TypeError:
+            return self.fn(*args, **kwargs)
+
+        entry = self.graphs.get(key)
+        if entry is None:
+            if len(self.graphs) >= _MAX_GRAPHS:
+                return self.fn(*args, **kwargs)
+            entry = self.graphs[key] = self._capture(leaves, spec)
+        if entry is False:
+            return self.fn(*args, **kwargs)
+
+        graph, static_in, static_out = entry
+        for dst, src in zip(static_in, leaves):
+            if torch.is_tensor(dst):
+                dst.copy_(src)
+        graph.replay()
+        return tree_map(lambda t: t.clone() if torch.is_tensor(t) else t, static_out)
+
+    def _capture(self, leaves, spec):
+        import torch
+        from torch.utils._pytree import tree_unflatten
+
+        static_in = [t.clone() if torch.is_tensor(t) else t for t in leaves]
+        args, kwargs = tree_unflatten(static_in, spec)
+        try:
+            stream = torch.cuda.Stream()
+            stream.wait_stream(torch.cuda.current_stream())
+            with torch.cuda.stream(stream):
+                for _ in range(_GRAPH_WARMUP):
+                    self.fn(*args, **kwargs)
+            torch.cuda.current_stream().wait_stream(stream)
+
+            graph = torch.cuda.CUDAGraph()
+            with torch.cuda.graph(graph):
+                static_out = self.fn(*args, **kwargs)
+        except RuntimeError as e:
+            print(f"   (CUDA graph capture failed, running eagerly: {e})")
+            return False
+        shapes = [tuple(t.shape) for t in leaves if torch.is_tensor(t)]
+        print(f"   (CUDA graph captured: {getattr(self.fn, 'func', self.fn).__qualname__} {shapes})")
+        return graph, static_in, static_out
+
+
+def _install_cuda_graphs():
+    """Patch whichever per-frame renderer this engine has so each instance replays a CUDA graph."""
+    for module_name, cls_name, method in _GRAPH_TARGETS:
+        try:
+            cls = getattr(importlib.import_module(module_name), cls_name)
+        except (ImportError, AttributeError):
+            continue
+
+        original = getattr(cls, method)
+        graphed = {}
+
+        @functools.wraps(original)
+        def patched(self, *args, _original=original, _graphed=graphed, **kwargs):
+            call = _graphed.get(id(self))
+            if call is None:
+                call = _graphed[id(self)] = _GraphedCall(functools.partial(_original, self))
+            return call(*args, **kwargs)
+
+        setattr(cls, method, patched)
+        print(f"   (CUDA graphs: patched {cls_name}.{method}, capturing on first call)")
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--device", default="cuda", help="cuda / mps")
+    p.add_argument("--fp16", action="store_true")
+    p.add_argument("--cuda-graph", action="store_true")
+    p.add_argument("script", help="Engine entry point, e.g. inference.py")
+    p.add_argument("script_args", nargs=argparse.REMAINDER)
+    args = p.parse_args()
+
+    import torch
+
+    script = Path(args.script).resolve()
+    sys.argv = [str(script), *args.script_args]
+    sys.path[0] = str(script.parent)
+
+    if args.device == "cuda":
+        torch.backends.cudnn.benchmark = True  # face crops have a fixed shape
+        if args.cuda_graph:
+            _install_cuda_graphs()
+
+    with contextlib.ExitStack() as stack:
+        if args.fp16:
+            stack.enter_context(torch.inference_mode())
+            try:
+                stack.enter_context(torch.autocast(device_type=args.device, dtype=torch.float16))
+            except RuntimeError as e:
+                print(f"   (autocast unavailable on {args.device}: {e} — running fp32)")
+        runpy.run_path(str(script), run_name="__main__")
+
+
+if __name__ == "__main__":
+    main()
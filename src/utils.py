@@ -1,12 +1,34 @@
+import functools
+import importlib.util
+import os
 import platform
+import shutil
 import subprocess
 import sys
+from pathlib import Path
 
+_REQUIRED_PACKAGES = ["sounddevice", "cv2", "av", "rembg", "onnxruntime", "PIL", "numpy", "scipy"]
+# Records the ffmpeg binary that last passed `ffmpeg -version`
+_REQS_CACHE = Path.home() / ".cache" / "tiktok_avatar" / "reqs_ok"
 
+
+def _nvidia_gpu_present() -> bool:
+    """Cheap NVIDIA driver check, so hosts without one never pay for `import torch` (~1.3s)."""
+    if Path("/proc/driver/nvidia/version").exists():
+        return True
+    try:
+        return subprocess.run(["nvidia-smi", "-L"], capture_output=True, timeout=2).returncode == 0
+    except (OSError, subprocess.SubprocessError):
+        return False
+
+
+@functools.lru_cache(maxsize=1)
 def get_device() -> str:
     """Auto-detect best available device."""
     if platform.system() == "Darwin" and platform.machine() == "arm64":
         return "mps"
+    if not _nvidia_gpu_present():
+        return "cpu"
     try:
         import torch
         if torch.cuda.is_available():
@@ -26,25 +48,40 @@ def banner():
 
 
 def check_requirements():
-    missing = []
-    for pkg in ["sounddevice", "cv2", "rembg", "PIL", "numpy", "scipy"]:
-        try:
-            __import__(pkg)
-        except ImportError:
-            missing.append(pkg)
+    # find_spec locates a package without executing it (import cv2 + rembg alone is ~1.5s)
+    missing = [pkg for pkg in _REQUIRED_PACKAGES if importlib.util.find_spec(pkg) is None]
     if missing:
         print(f"Missing packages: {missing}")
-        print("Run: pip install -r requirements.txt")
+        # onnxruntime isn't in requirements.txt: setup.sh picks the CPU/CUDA/Apple build
+        print("Run: bash setup.sh" if "onnxruntime" in missing else "Run: pip install -r requirements.txt")
+        sys.exit(1)
+
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        print("ffmpeg not found. Install: brew install ffmpeg")
         sys.exit(1)
 
-    result = subprocess.run(["ffmpeg", "-version"], capture_output=True)
+    # Only shell out to `ffmpeg -version` when the binary changed since the last good run
+    stamp = f"{ffmpeg}:{os.stat(ffmpeg).st_mtime_ns}"
+    try:
+        if _REQS_CACHE.read_text() == stamp:
+            return
+    except OSError:
+        pass
+
+    result = subprocess.run([ffmpeg, "-version"], capture_output=True)
     if result.returncode != 0:
         print("ffmpeg not found. Install: brew install ffmpeg")
         sys.exit(1)
 
+    try:
+        _REQS_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        _REQS_CACHE.write_text(stamp)
+    except OSError:
+        pass
+
 
 def check_engine(engine_dir: str, name: str):
-    from pathlib import Path
     if not Path(engine_dir).exists():
         print(f"\nERROR: {name} not found at {engine_dir}")
         print("Run: bash setup.sh")
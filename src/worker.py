@@ -0,0 +1,168 @@
+"""
+Warm worker for the animation engines.
+
+Keeps torch and the engines' heavy dependencies imported in one long-lived
+process and runs each job in a fork of it, so a pipeline run skips the
+interpreter + import start-up of a fresh `python inference.py`.
+
+    python src/worker.py [--socket ~/.tiktok_avatar/worker.sock] [--idle-timeout 3600]
+    python src/worker.py --stop
+
+Jobs arrive on a UNIX socket as one JSON line:
+    {"python": sys.executable, "argv": ["inference.py", ...], "cwd": "...", "env": {...}}
+and are answered with {"returncode": N}. A job from a different interpreter
+(another venv) is answered with {"refused": reason} so the client runs it
+itself. {"stop": true}, or no job for --idle-timeout seconds, shuts the worker
+down. Engine output goes to the worker's stdout (pipeline.py points it at
+~/.tiktok_avatar/worker.log).
+
+Like torch_runner.py this runs with engine directories on sys.path, so it must
+not import anything from this repo. Imports stop short of CUDA init, which
+does not survive fork. Linux only: on macOS, forking a process that has loaded
+system frameworks (Metal/MPS, Accelerate via torch and cv2) is unsafe.
+"""
+
+import argparse
+import importlib
+import json
+import os
+import runpy
+import socket
+import sys
+import traceback
+from pathlib import Path
+
+# Shared by SadTalker and LivePortrait; whatever isn't installed is skipped
+_WARM_IMPORTS = [
+    "numpy", "scipy", "cv2", "PIL", "imageio", "skimage", "librosa", "yaml",
+    "torch", "torchvision", "torch.nn.functional", "kornia", "face_alignment", "onnxruntime",
+]
+
+
+def _warm_up():
+    for name in _WARM_IMPORTS:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass
+
+
+def _run_job(job: dict, server: socket.socket, conn: socket.socket) -> int:
+    """Run one engine script in a forked child and return its exit code."""
+    pid = os.fork()
+    if pid:
+        _, status = os.waitpid(pid, 0)
+        return os.waitstatus_to_exitcode(status)
+
+    code = 1
+    try:
+        server.close()
+        conn.close()
+        os.chdir(job["cwd"])
+        os.environ.clear()
+        os.environ.update(job["env"])
+        script = str(Path(job["argv"][0]).resolve())
+        sys.argv = [script, *job["argv"][1:]]
+        sys.path[0] = str(Path(script).parent)
+        runpy.run_path(script, run_name="__main__")
+        code = 0
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+
+def _reply(conn: socket.socket, msg: dict):
+    try:
+        conn.sendall((json.dumps(msg) + "\n").encode())
+    except OSError:
+        pass  # client went away
+
+
+def serve(sock_path: Path, idle_timeout: float):
+    _warm_up()
+
+    # Anyone who can connect can run arbitrary commands as us: keep it owner-only
+    sock_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    os.chmod(sock_path.parent, 0o700)
+    sock_path.unlink(missing_ok=True)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)
+    try:
+        server.bind(str(sock_path))
+    finally:
+        os.umask(old_umask)
+    os.chmod(sock_path, 0o600)
+    server.listen()
+    server.settimeout(idle_timeout or None)
+    print(f"Worker ready on {sock_path} (pid {os.getpid()})", flush=True)
+
+    try:
+        while True:
+            try:
+                conn, _ = server.accept()
+            except TimeoutError:
+                print(f"Idle for {idle_timeout:.0f}s — shutting down", flush=True)
+                break
+            with conn:
+                try:
+                    line = conn.makefile("r").readline()
+                    if not line.strip():
+                        continue   # liveness probe from start_worker
+                    job = json.loads(line)
+                    if job.get("stop"):
+                        print("Stop requested — shutting down", flush=True)
+                        _reply(conn, {"stopped": True})
+                        break
+                    if job.get("python") != sys.executable:
+                        # Warm imports belong to our interpreter; let the client run it itself
+                        _reply(conn, {"refused": f"worker runs {sys.executable}, job wants {job.get('python')}"})
+                        continue
+                    print(f"\n── job: {' '.join(job['argv'])}", flush=True)
+                    rc = _run_job(job, server, conn)
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"Bad job: {e}", flush=True)
+                    rc = 1
+                _reply(conn, {"returncode": rc})
+    finally:
+        server.close()
+        sock_path.unlink(missing_ok=True)
+
+
+def stop(sock_path: Path):
+    """Ask a running worker to shut down."""
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(str(sock_path))
+    except OSError:
+        client.close()
+        print(f"No worker listening on {sock_path}")
+        return
+    with client:
+        client.sendall(b'{"stop": true}\n')
+        client.makefile("r").readline()
+    print("Worker stopped")
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--socket", default=str(Path.home() / ".tiktok_avatar" / "worker.sock"))
+    p.add_argument("--idle-timeout", type=float, default=3600,
+                   help="Exit after this many seconds without a job; 0 keeps running (default: 3600)")
+    p.add_argument("--stop", action="store_true", help="Stop the worker listening on --socket and exit")
+    args = p.parse_args()
+    sock_path = Path(args.socket).expanduser()
+    if args.stop:
+        stop(sock_path)
+        return
+    if sys.platform == "darwin":
+        sys.exit("worker.py is Linux only: forking after torch/cv2 imports is unsafe on macOS")
+    serve(sock_path, args.idle_timeout)
+
+
+if __name__ == "__main__":
+    main()